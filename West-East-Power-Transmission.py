@@ -6,16 +6,35 @@ author:pwy
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import pandas as pd
 import numpy as np
 import pymysql
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from scipy.stats import pearsonr, spearmanr
-from sklearn.linear_model import LinearRegression
+from plotly_resampler import FigureResampler
+from plotly_resampler.aggregation import MinMaxLTTB
+from scipy.stats import t as student_t
+import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import quote_plus
+
+try:
+    import connectorx as cx
+except ImportError:  # 未安装connectorx时退回pymysql读取
+    cx = None
+
+try:
+    from numba import njit
+except ImportError:  # 未安装numba时按普通Python函数运行
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
 
 warnings.filterwarnings('ignore')
 
@@ -50,6 +69,11 @@ DC_CONFIG = {
     }
 }
 
+# 本地Parquet缓存目录：进程重启或内存缓存过期后，可跳过Excel解析和数据库查询
+CACHE_DIR = Path('.cache')
+# 缓存表结构变化时递增，使旧缓存文件自动失效
+CACHE_VERSION = 2
+
 
 
 # ============================================================================
@@ -65,70 +89,83 @@ st.set_page_config(
 # ============================================================================
 # 自定义CSS样式
 # ============================================================================
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: bold;
-        color: #1E88E5;
-        text-align: center;
-        margin-bottom: 1rem;
-    }
-    .sub-header {
-        font-size: 1.2rem;
-        color: #666;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .metric-card {
-        background-color: #f0f2f6;
-        border-radius: 10px;
-        padding: 1rem;
-        margin: 0.5rem 0;
-    }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 24px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        padding-left: 20px;
-        padding-right: 20px;
-    }
-    .dc-info {
-        background-color: #e8f4f8;
-        border-left: 4px solid #1E88E5;
-        padding: 10px;
-        margin: 10px 0;
-        border-radius: 0 5px 5px 0;
-    }
-</style>
-""", unsafe_allow_html=True)
+@st.cache_resource
+def load_css():
+    """读取样式表，只在首次运行时读取文件"""
+    with open('assets/app.css', encoding='utf-8') as f:
+        return f.read()
+
+st.markdown(f"<style>\n{load_css()}</style>", unsafe_allow_html=True)
 
 # ============================================================================
 # 数据加载函数 - 使用缓存提高性能
 # ============================================================================
-@st.cache_data(ttl=3600)  # 缓存1小时
+def _read_parquet_cache(name, source_mtime):
+    """读取本地Parquet缓存，缓存不存在或早于数据源时返回None"""
+    cache_path = CACHE_DIR / f'{name}.v{CACHE_VERSION}.parquet'
+    try:
+        if cache_path.stat().st_mtime >= source_mtime:
+            return pd.read_parquet(cache_path)
+    except Exception:
+        pass
+    return None
+
+def _write_parquet_cache(name, df):
+    """写入本地Parquet缓存（先写临时文件再替换），写入失败不影响数据加载"""
+    cache_path = CACHE_DIR / f'{name}.v{CACHE_VERSION}.parquet'
+    tmp_path = cache_path.with_suffix('.tmp')
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        df.to_parquet(tmp_path, compression='zstd')
+        tmp_path.replace(cache_path)
+    except Exception:
+        pass
+
+@st.cache_data(ttl=3600, show_spinner=False)  # 缓存1小时
 def load_river_data():
     """从数据库加载河流水位数据"""
     try:
-        conn = pymysql.connect(
-            host=st.secrets["db_host"],
-            port=3306,
-            database=st.secrets["db_name"],
-            charset="utf8",
-            user=st.secrets["db_user"],
-            passwd=st.secrets["db_pass"]
-            )
+        # 数据库没有修改时间可比较，本地缓存与内存缓存一样1小时内有效
+        df = _read_parquet_cache('water_rain_river', time.time() - 3600)
+        if df is not None:
+            return df
+        
+        # 只取需要的列，并在数据库端筛选云南省数据（包含'云南'和'云南省'两种标记）
+        # 建议在数据库上建立 (region, time) 索引
+        sql = (
+            "SELECT time, region, river_name, water_level FROM water_rain_river "
+            "WHERE region IN ('云南', '云南省')"
+        )
         
-        sql = "SELECT * FROM water_rain_river"
-        df = pd.read_sql(sql, conn)
-        conn.close()
+        if cx is not None:
+            # connectorx（Rust实现）按列直接构建DataFrame，省去逐行生成Python元组
+            conn_str = (
+                f"mysql://{quote_plus(st.secrets['db_user'])}:{quote_plus(st.secrets['db_pass'])}"
+                f"@{st.secrets['db_host']}:3306/{st.secrets['db_name']}"
+            )
+            df = cx.read_sql(conn_str, sql, return_type="pandas")
+            df['time'] = pd.to_datetime(df['time'])
+        else:
+            conn = pymysql.connect(
+                host=st.secrets["db_host"],
+                port=3306,
+                database=st.secrets["db_name"],
+                charset="utf8",
+                user=st.secrets["db_user"],
+                passwd=st.secrets["db_pass"]
+                )
+            df = pd.read_sql(sql, conn, parse_dates=['time'])
+            conn.close()
         
-        # 处理时间字段
-        df['time'] = pd.to_datetime(df['time'])
+        # 地区、河流名称重复度高，转为分类类型可大幅节省内存，筛选和分组时按整数编码比较
+        df['region'] = df['region'].astype('category')
+        df['river_name'] = df['river_name'].astype('category')
+        # 水位无需双精度，float32使后续分组、合并的内存带宽减半（相关性计算内部会转回float64累加）
+        df['water_level'] = df['water_level'].astype('float32')
         
-        # 筛选云南省数据（包含'云南'和'云南省'两种标记）
-        df = df[df['region'].isin(['云南', '云南省'])]
+        # 以排序后的时间作为索引，便于按时间范围切片
+        df = df.set_index('time').sort_index()
+        _write_parquet_cache('water_rain_river', df)
         
         return df
     except Exception as e:
@@ -141,87 +178,418 @@ def load_power_data(dc_name):
     
     参数:
         dc_name: 直流名称，如 '楚穗直流'、'昆柳龙直流' 等
+    
+    返回:
+        以日期（DatetimeIndex，已排序）为索引、含 power_sum 列的日发电量表
     """
     try:
         config = DC_CONFIG[dc_name]
         file_path = config['file_path']
         column_name = config['column_name']
+        cache_name = Path(file_path).stem
         
-        df = pd.read_excel(file_path)
-        df['datetime'] = pd.to_datetime(df['日期'].astype(str) + ' ' + df['时点'].astype(str))
+        # Excel文件未更新时直接读取本地缓存
+        df_daily = _read_parquet_cache(cache_name, Path(file_path).stat().st_mtime)
+        if df_daily is not None:
+            return df_daily
+        
+        # calamine引擎（Rust实现）解析速度远快于默认的openpyxl，且只读取需要的三列
+        df = pd.read_excel(file_path, engine="calamine", usecols=['日期', '时点', column_name])
+        # 时点为"HH:MM"格式，日期与时间偏移直接相加，避免逐行拼接字符串再解析
+        df['datetime'] = pd.to_datetime(df['日期']) + pd.to_timedelta(df['时点'].astype(str) + ':00')
         df = df[['datetime', column_name]]
         df = df.rename(columns={column_name: 'power_actual'})
         
-        # 聚合到日级别
-        df['date'] = df['datetime'].dt.date
-        df_daily = df.groupby('date').agg({'power_actual': 'sum'}).reset_index()
-        df_daily.columns = ['date', 'power_sum']
-        df_daily['date'] = pd.to_datetime(df_daily['date'])
-        df_daily = df_daily[df_daily['power_sum'].notna()]
+        # 聚合到日级别（resample直接在datetime64上分桶，min_count=1使缺测日为NaN后剔除）
+        # 结果以排序后的日期为索引，按时间范围取数时可直接二分切片
+        df_daily = (
+            df.set_index('datetime')[['power_actual']]
+            .resample('D').sum(min_count=1)
+            .rename(columns={'power_actual': 'power_sum'})
+            .rename_axis('date')
+        )
+        df_daily = df_daily[df_daily['power_sum'].notna()].astype({'power_sum': 'float32'})
+        _write_parquet_cache(cache_name, df_daily)
         
         return df_daily
     except Exception as e:
         st.error(f"发电数据加载失败 ({dc_name}): {str(e)}")
         return None
 
+def load_power_data_parallel(dc_names):
+    """并行加载多个直流的发电数据（各文件相互独立，使用线程池读取），跳过加载失败的直流"""
+    all_data = {}
+    if not dc_names:
+        return all_data
+    # 工作线程需要挂上当前会话的上下文，st.error 等调用才能正常显示
+    with ThreadPoolExecutor(
+        max_workers=min(8, len(dc_names)),
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx())
+    ) as executor:
+        for dc_name, df in zip(dc_names, executor.map(load_power_data, dc_names)):
+            if df is not None:
+                all_data[dc_name] = df
+    return all_data
+
 @st.cache_data(ttl=3600)
 def load_all_power_data():
     """加载所有直流的发电数据"""
-    all_data = {}
-    for dc_name in DC_CONFIG.keys():
-        df = load_power_data(dc_name)
-        if df is not None:
-            all_data[dc_name] = df
-    return all_data
+    return load_power_data_parallel(list(DC_CONFIG.keys()))
 
+@st.cache_data(ttl=3600, max_entries=5)  # 按时间范围缓存，只保留最近几组
 def process_water_data(df_river, start_date, end_date):
-    """处理水位数据"""
-    df_water = df_river[
-        (df_river['time'] >= start_date) & 
-        (df_river['time'] <= end_date)
-    ][['time', 'river_name', 'water_level']].copy()
+    """处理水位数据
     
+    df_river 以已排序的 time 为索引，时间范围可直接二分切片，无需全表布尔筛选
+    """
+    df_water = df_river.loc[start_date:end_date, ['river_name', 'water_level']]
+    # dropna已返回新表，直接添加日期列即可，不必再经assign整表复制一次
     df_water = df_water.dropna(subset=['water_level'])
-    df_water['water_level'] = df_water['water_level'].astype(float)
-    df_water['date'] = pd.to_datetime(df_water['time'].dt.date)
-    df_water = df_water.sort_values(by=['river_name', 'time']).reset_index(drop=True)
+    df_water['date'] = df_water.index.floor('D')
+    # 只保留时间范围内出现的河流类别，分类编码即可直接给出河流列表
+    df_water['river_name'] = df_water['river_name'].astype('category').cat.remove_unused_categories()
+    # 索引已按时间排序，稳定排序后各河流内部仍保持时间顺序
+    df_water = df_water.sort_values(by='river_name', kind='stable').reset_index()
     
     return df_water
 
+@st.cache_data(ttl=3600)
+def river_list(df_water):
+    """按名称排序的河流列表（直接取分类类别，无需扫描整列去重）"""
+    return sorted(df_water['river_name'].cat.categories.tolist())
+
+@st.cache_data(ttl=3600, max_entries=5)
+def filter_power(df_power, start_date, end_date):
+    """截取时间范围内的日发电量，返回带 date 列的表"""
+    return df_power.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)].reset_index()
+
+@st.cache_data(ttl=3600, max_entries=5)
+def join_water_power(df_water, df_power_filtered):
+    """水位长表附上当日发电量（只保留两者都有数据的日期），各标签页共用这一次合并"""
+    return pd.merge(
+        df_water[['date', 'river_name', 'water_level']],
+        df_power_filtered[['date', 'power_sum']],
+        on='date',
+        how='inner'
+    )
+
+def daily_water_power(water_daily, df_power_filtered):
+    """逐日水位序列附上当日发电量（只保留两者都有数据的日期）"""
+    return pd.merge(
+        water_daily.rename('water_level').reset_index(),
+        df_power_filtered[['date', 'power_sum']],
+        on='date',
+        how='inner'
+    )
+
+@st.cache_data(ttl=3600, max_entries=5)
+def water_wide(df_water):
+    """按 日期×河流 汇总水位的宽表
+    
+    对任意一组河流，各列按行求和即等于这些河流当日全部水位记录之和，
+    避免每次交互都对长表重新分组。
+    """
+    return df_water.pivot_table(
+        index='date',
+        columns='river_name',
+        values='water_level',
+        aggfunc='sum',
+        observed=True
+    )
+
+@st.cache_data(ttl=3600, max_entries=5)
+def build_daily_aggregates(df_water):
+    """逐日水位汇总：全部河流水位总和，以及 日期×河流 水位和宽表
+    
+    Tab 3 直接取全部河流总和；Tab 2 对选中河流的列按行求和即可，水位数据不变时不再重新分组。
+    """
+    sum_by_river = water_wide(df_water)
+    return {
+        'sum_all': sum_by_river.sum(axis=1, min_count=1).dropna(),
+        'sum_by_river': sum_by_river
+    }
+
+def join_dc_water(df_water, all_power_data, selected_rivers, start_date, end_date):
+    """各直流发电量按日期对齐成宽表，与选中河流的逐日水位和只做一次连接
+    
+    返回以日期为索引、每个直流一列再加 water_level 列的表；没有任何直流数据时返回只有 water_level 列的空表。
+    """
+    if not all_power_data:
+        return pd.DataFrame(columns=['water_level'], dtype=float)
+    
+    # 选中河流的水位：在缓存的宽表上按行求和
+    water_sum = (
+        water_wide(df_water)[selected_rivers]
+        .sum(axis=1, min_count=1)
+        .dropna()
+        .rename('water_level')
+    )
+    
+    # 日期索引已排序，.loc按时间范围二分切片
+    df_power_wide = pd.concat(
+        {
+            dc_name: df_power.loc[pd.Timestamp(start_date):pd.Timestamp(end_date), 'power_sum']
+            for dc_name, df_power in all_power_data.items()
+        },
+        axis=1
+    ).sort_index()
+    return df_power_wide.join(water_sum, how='inner').astype(float)
+
+def _correlation_pvalue(r, n):
+    """相关系数的双侧检验P值（t分布，自由度 n-2）"""
+    t_stat = r * np.sqrt((n - 2) / (1 - r * r))
+    return 2 * student_t.sf(np.abs(t_stat), n - 2)
+
+@njit
+def _rank_1d(a):
+    """计算秩次，并列值取平均秩（与scipy.stats.rankdata默认方式一致）"""
+    n = a.size
+    order = np.argsort(a, kind='mergesort')
+    ranks = np.empty(n)
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and a[order[j + 1]] == a[order[i]]:
+            j += 1
+        avg_rank = (i + j) / 2.0 + 1.0
+        for k in range(i, j + 1):
+            ranks[order[k]] = avg_rank
+        i = j + 1
+    return ranks
+
+@njit
+def spearman_1d(x, y):
+    """Spearman秩相关系数，即秩次上的Pearson相关系数（有并列值时同样精确）"""
+    rx = _rank_1d(x)
+    ry = _rank_1d(y)
+    n = x.size
+    rank_mean = (n + 1) / 2.0
+    sxx = 0.0
+    syy = 0.0
+    sxy = 0.0
+    for i in range(n):
+        dx = rx[i] - rank_mean
+        dy = ry[i] - rank_mean
+        sxx += dx * dx
+        syy += dy * dy
+        sxy += dx * dy
+    # 任一序列为常数时相关系数无定义（与scipy一致返回NaN），避免JIT内核抛出除零异常
+    if sxx == 0 or syy == 0:
+        return np.nan
+    return sxy / np.sqrt(sxx * syy)
+
+@njit
+def _grouped_pearson_slope(x, y, bounds):
+    """按分组边界逐组计算 Pearson 相关系数、回归斜率和样本量
+    
+    x、y 需按组连续排列，第 k 组为 [bounds[k], bounds[k+1])；
+    组内先求均值再累加离差平方和，避免大数相减的舍入误差。
+    """
+    n_groups = bounds.size - 1
+    r = np.full(n_groups, np.nan)
+    slope = np.full(n_groups, np.nan)
+    n = np.zeros(n_groups, dtype=np.int64)
+    for k in range(n_groups):
+        lo = bounds[k]
+        hi = bounds[k + 1]
+        m = hi - lo
+        n[k] = m
+        if m < 2:
+            continue
+        xm = 0.0
+        ym = 0.0
+        for i in range(lo, hi):
+            xm += x[i]
+            ym += y[i]
+        xm /= m
+        ym /= m
+        sxx = 0.0
+        syy = 0.0
+        sxy = 0.0
+        for i in range(lo, hi):
+            dx = x[i] - xm
+            dy = y[i] - ym
+            sxx += dx * dx
+            syy += dy * dy
+            sxy += dx * dy
+        if sxx > 0:
+            slope[k] = sxy / sxx
+            if syy > 0:
+                r[k] = sxy / np.sqrt(sxx * syy)
+    return r, slope, n
+
 def calculate_correlation(water_values, power_values):
-    """计算相关性指标"""
+    """计算相关性指标
+    
+    一元线性回归的斜率、截距、R²与Pearson相关系数都可由同一组均值和离差平方和求出，
+    一次遍历即可得到全部结果；Spearman相关系数由JIT编译的秩相关内核计算。
+    
+    参数:
+        water_values, power_values: 一维数组，内部统一转为连续的float64数组后计算
+    """
     if len(water_values) < 10:
         return None
     
     try:
-        pearson_r, pearson_p = pearsonr(water_values, power_values)
-        spearman_r, spearman_p = spearmanr(water_values, power_values)
+        # DataFrame列的.values可能是带步长的视图，转为连续数组便于向量化及JIT内核使用
+        x = np.ascontiguousarray(water_values, dtype=np.float64)
+        y = np.ascontiguousarray(power_values, dtype=np.float64)
+        n = len(x)
         
-        model = LinearRegression()
-        model.fit(water_values.reshape(-1, 1), power_values)
-        r2 = model.score(water_values.reshape(-1, 1), power_values)
-        slope = model.coef_[0]
-        intercept = model.intercept_
+        xm = x.mean()
+        ym = y.mean()
+        dx = x - xm
+        dy = y - ym
+        # 点积直接累加，不再生成 dx*dx 等中间数组
+        sxx = dx @ dx
+        syy = dy @ dy
+        sxy = dx @ dy
+        
+        pearson_r = sxy / np.sqrt(sxx * syy)
+        slope = sxy / sxx
+        intercept = ym - slope * xm
+        r2 = pearson_r * pearson_r
+        
+        spearman_r = spearman_1d(x, y)
         
         return {
             'pearson_r': pearson_r,
-            'pearson_p': pearson_p,
+            'pearson_p': _correlation_pvalue(pearson_r, n),
             'spearman_r': spearman_r,
-            'spearman_p': spearman_p,
+            'spearman_p': _correlation_pvalue(spearman_r, n),
             'r2': r2,
             'slope': slope,
             'intercept': intercept,
-            'n': len(water_values)
+            'n': n
         }
     except Exception as e:
         return None
 
+@st.cache_data(ttl=3600)
+def river_correlation_table(df_joined, min_n=10):
+    """所有河流日均水位与发电量的相关性汇总表
+    
+    由水位-发电量合并长表得到各河流逐日数据（按河流类别编码、日期排序）后，
+    在编码数组上用 searchsorted 求出各河流的切片边界，交给JIT内核逐组计算，
+    不再逐条河流筛选、合并，也不经过pandas分组聚合。
+    """
+    df_long = (
+        df_joined.groupby(['river_name', 'date'], observed=True)
+        .agg(water_level=('water_level', 'mean'), power_sum=('power_sum', 'first'))
+        .reset_index()
+    )
+    
+    rivers = df_long['river_name'].cat.categories
+    codes = df_long['river_name'].cat.codes.to_numpy()
+    bounds = np.searchsorted(codes, np.arange(len(rivers) + 1))
+    pearson_r, slope, n = _grouped_pearson_slope(
+        np.ascontiguousarray(df_long['water_level'].to_numpy(dtype=np.float64)),
+        np.ascontiguousarray(df_long['power_sum'].to_numpy(dtype=np.float64)),
+        bounds
+    )
+    
+    # 各河流切片内日期已升序，首末行即数据起止日期
+    keep = n >= min_n
+    dates = df_long['date'].to_numpy()
+    start_dates = pd.DatetimeIndex(dates[bounds[:-1][keep]])
+    end_dates = pd.DatetimeIndex(dates[bounds[1:][keep] - 1])
+    return pd.DataFrame({
+        '河流名称': rivers[keep].astype(str),
+        '样本量': n[keep],
+        'Pearson_r': pearson_r[keep],
+        'R²': pearson_r[keep] ** 2,
+        'P值': _correlation_pvalue(pearson_r[keep], n[keep]),
+        '回归斜率': slope[keep],
+        '数据起始': start_dates.strftime('%Y-%m-%d'),
+        '数据结束': end_dates.strftime('%Y-%m-%d')
+    })
+
+@st.cache_data(ttl=3600)
+def river_daily_means(df_river):
+    """全时段 日期×河流 日均水位宽表
+    
+    水位数据在会话内不变，只汇总一次；单条河流分析切换河流或直流时直接按列取用。
+    """
+    water = df_river[['river_name', 'water_level']].dropna()
+    return (
+        water.groupby([water.index.floor('D').rename('date'), 'river_name'], observed=True)['water_level']
+        .mean()
+        .unstack('river_name')
+    )
+
+@st.cache_data(ttl=3600)
+def build_river_power_daily(df_river, df_power, river_name):
+    """单条河流全时段的日均水位与发电量合并表（按日期排序）"""
+    water_daily = river_daily_means(df_river)[river_name].dropna().rename('water_level')
+    df_pair = df_power[['power_sum']].join(water_daily, how='inner')
+    return df_pair.dropna().sort_index().reset_index()
+
+@st.cache_data(ttl=3600)
+def build_prefix_sums(df_merged):
+    """按日期累加 Σx、Σy、Σx²、Σy²、Σxy 的前缀和表（x为水位，y为发电量）
+    
+    累加前先减去全序列均值，减小大数相减带来的舍入误差；
+    任意时间窗口的统计量只需两行前缀和相减即可得到。
+    """
+    x0 = float(df_merged['water_level'].mean())
+    y0 = float(df_merged['power_sum'].mean())
+    x = df_merged['water_level'].to_numpy(dtype=float) - x0
+    y = df_merged['power_sum'].to_numpy(dtype=float) - y0
+    sums = np.column_stack([x, y, x * x, y * y, x * y])
+    return {
+        'dates': df_merged['date'].to_numpy(),
+        'cum': np.vstack([np.zeros((1, 5)), np.cumsum(sums, axis=0)]),
+        'x0': x0,
+        'y0': y0
+    }
+
+def correlation_from_prefix(prefix, start_date, end_date):
+    """由前缀和表以O(1)计算 [start_date, end_date] 内的相关性指标（不含Spearman）"""
+    dates = prefix['dates']
+    a = np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date)), side='left')
+    b = np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date)), side='right')
+    n = int(b - a)
+    if n < 10:
+        return None
+    
+    sx, sy, sxx, syy, sxy = prefix['cum'][b] - prefix['cum'][a]
+    cxx = sxx - sx * sx / n
+    cyy = syy - sy * sy / n
+    cxy = sxy - sx * sy / n
+    
+    pearson_r = cxy / np.sqrt(cxx * cyy)
+    slope = cxy / cxx
+    intercept = (sy / n + prefix['y0']) - slope * (sx / n + prefix['x0'])
+    
+    return {
+        'pearson_r': pearson_r,
+        'pearson_p': _correlation_pvalue(pearson_r, n),
+        'r2': pearson_r * pearson_r,
+        'slope': slope,
+        'intercept': intercept,
+        'n': n
+    }
+
+@st.cache_data(ttl=3600)
+def to_csv_bytes(df):
+    """导出CSV字节（带BOM，Excel可直接识别中文），同一结果表重新运行时不再重复生成"""
+    return df.to_csv(index=False).encode('utf-8-sig')
+
 # ============================================================================
-# 绘图函数
+# 绘图函数 - 图表对象按输入缓存，数据和选择未变时重新运行不再重建
 # ============================================================================
+@st.cache_data(ttl=3600)
 def plot_timeseries(df_merged, river_name, dc_name, stats=None):
-    """绘制时序图"""
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    """绘制时序图
+    
+    使用FigureResampler包装，长时间范围时每条曲线只向浏览器发送约2000个降采样点
+    """
+    fig = FigureResampler(
+        make_subplots(specs=[[{"secondary_y": True}]]),
+        default_n_shown_samples=2000,
+        default_downsampler=MinMaxLTTB()
+    )
     
     dc_color = DC_CONFIG.get(dc_name, {}).get('color', '#1f77b4')
     
@@ -286,15 +654,16 @@ def plot_timeseries(df_merged, river_name, dc_name, stats=None):
     
     return fig
 
+@st.cache_data(ttl=3600)
 def plot_scatter(df_merged, river_name, dc_name, stats=None):
     """绘制散点回归图"""
     fig = go.Figure()
     
     dc_color = DC_CONFIG.get(dc_name, {}).get('color', '#3498db')
     
-    # 散点
+    # 散点（WebGL渲染，点数多时远快于SVG）
     fig.add_trace(
-        go.Scatter(
+        go.Scattergl(
             x=df_merged['water_level'],
             y=df_merged['power_sum'],
             mode='markers',
@@ -359,22 +728,13 @@ def plot_multi_dc_comparison(df_water, all_power_data, selected_rivers, start_da
     """绘制多直流对比图"""
     fig = go.Figure()
     
-    # 处理选中河流的水位数据
-    df_water_selected = df_water[df_water['river_name'].isin(selected_rivers)].copy()
-    df_water_sum = df_water_selected.groupby('date').agg({'water_level': 'sum'}).reset_index()
+    # 各直流发电量与选中河流水位和只做一次连接
+    df_joined = join_dc_water(df_water, all_power_data, selected_rivers, start_date, end_date)
     
     results = []
     
-    for dc_name, df_power in all_power_data.items():
-        # 筛选时间范围
-        df_power_filtered = df_power[
-            (df_power['date'] >= str(start_date)) & 
-            (df_power['date'] <= str(end_date))
-        ].copy()
-        
-        # 合并数据
-        df_merged = pd.merge(df_power_filtered, df_water_sum, on='date', how='inner')
-        df_merged = df_merged.dropna()
+    for dc_name in all_power_data:
+        df_merged = df_joined[['water_level', dc_name]].rename(columns={dc_name: 'power_sum'}).dropna()
         
         if len(df_merged) >= 10:
             stats = calculate_correlation(
@@ -389,9 +749,9 @@ def plot_multi_dc_comparison(df_water, all_power_data, selected_rivers, start_da
                     '样本量': stats['n']
                 })
                 
-                # 添加散点
+                # 添加散点（WebGL渲染）
                 fig.add_trace(
-                    go.Scatter(
+                    go.Scattergl(
                         x=df_merged['water_level'],
                         y=df_merged['power_sum'],
                         mode='markers',
@@ -413,6 +773,333 @@ def plot_multi_dc_comparison(df_water, all_power_data, selected_rivers, start_da
     
     return fig, pd.DataFrame(results)
 
+# ============================================================================
+# 标签页 - 含控件的标签页用 st.fragment 包装，操作控件时只重新运行该标签页
+# ============================================================================
+@st.fragment
+def render_single_river_tab(df_river, df_power, all_rivers, selected_dc, start_date, end_date):
+    """Tab 1: 单条河流分析"""
+    st.header(f"单条河流与{selected_dc}发电量相关性分析")
+    
+    # 河流选择
+    selected_river = st.selectbox(
+        "选择河流",
+        options=all_rivers,
+        index=0 if len(all_rivers) > 0 else None,
+        key="tab1_river"
+    )
+    
+    if selected_river:
+        # 该河流全时段的合并数据及前缀和只在首次选择时计算，调整时间范围时直接复用
+        df_pair = build_river_power_daily(df_river, df_power, selected_river)
+        prefix = build_prefix_sums(df_pair)
+        
+        # 合并表已按日期排序，二分查找截取时间范围
+        lo = df_pair['date'].searchsorted(pd.Timestamp(start_date), side='left')
+        hi = df_pair['date'].searchsorted(pd.Timestamp(end_date), side='right')
+        df_merged = df_pair.iloc[lo:hi]
+        
+        # 计算相关性（两行前缀和相减）
+        if len(df_merged) >= 10:
+            stats = correlation_from_prefix(prefix, start_date, end_date)
+            
+            # 显示统计指标
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Pearson相关系数", f"{stats['pearson_r']:.4f}")
+            with col2:
+                st.metric("R²决定系数", f"{stats['r2']:.4f}")
+            with col3:
+                st.metric("样本量", f"{stats['n']}")
+            with col4:
+                p_str = f"{stats['pearson_p']:.2e}" if stats['pearson_p'] < 0.001 else f"{stats['pearson_p']:.4f}"
+                st.metric("P值", p_str)
+            
+            # 绘制图表
+            col1, col2 = st.columns(2)
+            with col1:
+                st.plotly_chart(plot_timeseries(df_merged, selected_river, selected_dc, stats), use_container_width=True)
+            with col2:
+                st.plotly_chart(plot_scatter(df_merged, selected_river, selected_dc, stats), use_container_width=True)
+            
+            # 显示数据表格
+            with st.expander("查看原始数据"):
+                st.dataframe(df_merged, use_container_width=True)
+        else:
+            st.warning(f"⚠️ 该河流有效数据点不足10个（当前: {len(df_merged)}），无法进行相关性分析")
+
+@st.fragment
+def render_multi_river_tab(daily_aggs, df_power_filtered, all_rivers, selected_dc):
+    """Tab 2: 多河流组合分析"""
+    st.header(f"多河流组合与{selected_dc}发电量相关性分析")
+    st.info("💡 选择多条河流，系统将计算它们水位总和与发电量的相关性")
+    
+    # 多选河流
+    selected_rivers = st.multiselect(
+        "选择河流（可多选）",
+        options=all_rivers,
+        default=all_rivers[:5] if len(all_rivers) >= 5 else all_rivers,
+        key="tab2_rivers"
+    )
+    
+    # 预设河流组
+    st.markdown("**快捷选择：**")
+    preset_col1, preset_col2, preset_col3 = st.columns(3)
+    
+    # 预设河流组定义 - 【修改点2】可以在这里添加更多预设河流组
+    lancang_rivers = ['硕多岗河', '漾弓江', '龙川江', '白水河', '万马河']
+    nanpan_rivers = ['南盘江', '牛栏江', '大汶溪', '关河', '螳螂川', '宁蒗河', '落漏河', '马过河', '五郎河']
+    
+    with preset_col1:
+        if st.button("澜沧江水系", key="btn_lancang"):
+            st.session_state['selected_rivers_tab2'] = [r for r in lancang_rivers if r in all_rivers]
+            st.rerun()
+    
+    with preset_col2:
+        if st.button("南盘江水系", key="btn_nanpan"):
+            st.session_state['selected_rivers_tab2'] = [r for r in nanpan_rivers if r in all_rivers]
+            st.rerun()
+    
+    with preset_col3:
+        if st.button("全部河流", key="btn_all"):
+            st.session_state['selected_rivers_tab2'] = all_rivers
+            st.rerun()
+    
+    if len(selected_rivers) > 0:
+        # 选中河流的逐日水位和按行相加
+        df_merged = daily_water_power(
+            daily_aggs['sum_by_river'][selected_rivers].sum(axis=1, min_count=1).dropna(),
+            df_power_filtered
+        )
+        
+        if len(df_merged) >= 10:
+            stats = calculate_correlation(
+                df_merged['water_level'].values,
+                df_merged['power_sum'].values
+            )
+            
+            # 显示统计指标
+            st.markdown(f"**已选择 {len(selected_rivers)} 条河流：** {', '.join(selected_rivers)}")
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Pearson相关系数", f"{stats['pearson_r']:.4f}")
+            with col2:
+                st.metric("R²决定系数", f"{stats['r2']:.4f}")
+            with col3:
+                st.metric("样本量", f"{stats['n']}")
+            with col4:
+                p_str = f"{stats['pearson_p']:.2e}" if stats['pearson_p'] < 0.001 else f"{stats['pearson_p']:.4f}"
+                st.metric("P值", p_str)
+            
+            # 绘制图表
+            river_name = f"选中{len(selected_rivers)}条河流总和"
+            col1, col2 = st.columns(2)
+            with col1:
+                st.plotly_chart(plot_timeseries(df_merged, river_name, selected_dc, stats), use_container_width=True)
+            with col2:
+                st.plotly_chart(plot_scatter(df_merged, river_name, selected_dc, stats), use_container_width=True)
+        else:
+            st.warning(f"⚠️ 有效数据点不足10个（当前: {len(df_merged)}）")
+    else:
+        st.info("请选择至少一条河流")
+
+def render_all_rivers_tab(daily_aggs, df_power_filtered, all_rivers, selected_dc):
+    """Tab 3: 所有河流汇总"""
+    st.header(f"所有河流水位总和与{selected_dc}发电量相关性")
+    
+    # 所有河流逐日水位总和已预先汇总
+    df_merged_all = daily_water_power(daily_aggs['sum_all'], df_power_filtered)
+    
+    if len(df_merged_all) >= 10:
+        stats = calculate_correlation(
+            df_merged_all['water_level'].values,
+            df_merged_all['power_sum'].values
+        )
+        
+        # 显示统计指标
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Pearson相关系数", f"{stats['pearson_r']:.4f}")
+        with col2:
+            st.metric("R²决定系数", f"{stats['r2']:.4f}")
+        with col3:
+            st.metric("河流总数", f"{len(all_rivers)} 条")
+        with col4:
+            st.metric("样本量", f"{stats['n']}")
+        
+        # 绘制图表
+        river_name = f"云南省所有河流（共{len(all_rivers)}条）"
+        col1, col2 = st.columns(2)
+        with col1:
+            st.plotly_chart(plot_timeseries(df_merged_all, river_name, selected_dc, stats), use_container_width=True)
+        with col2:
+            st.plotly_chart(plot_scatter(df_merged_all, river_name, selected_dc, stats), use_container_width=True)
+
+def render_overview_tab(df_joined, selected_dc):
+    """Tab 4: 数据总览"""
+    st.header(f"河流与{selected_dc}相关性排名")
+    
+    # 计算所有河流的相关性（按河流分组一次算出）
+    with st.spinner("正在计算各河流相关性..."):
+        df_results = river_correlation_table(df_joined)
+    
+    if len(df_results) > 0:
+        df_results = df_results.sort_values('Pearson_r', key=abs, ascending=False).reset_index(drop=True)
+        df_results.insert(0, '排名', range(1, len(df_results) + 1))
+        
+        # 格式化显示（去掉background_gradient避免需要matplotlib）
+        st.dataframe(
+            df_results.style.format({
+                'Pearson_r': '{:.4f}',
+                'R²': '{:.4f}',
+                'P值': '{:.2e}',
+                '回归斜率': '{:.4f}'
+            }),
+            use_container_width=True,
+            height=600
+        )
+        
+        # 下载按钮
+        st.download_button(
+            label=f"📥 下载{selected_dc}相关性分析结果 (CSV)",
+            data=to_csv_bytes(df_results),
+            file_name=f"river_correlation_{selected_dc}.csv",
+            mime="text/csv"
+        )
+    else:
+        st.warning("没有足够的数据进行相关性分析")
+
+@st.fragment
+def render_multi_dc_tab(df_water, all_rivers, start_date, end_date):
+    """Tab 5: 多直流对比"""
+    st.header("多直流与河流水位相关性对比")
+    st.info("💡 对比不同直流与选定河流水位的相关性")
+    
+    # 选择要对比的直流
+    compare_dcs = st.multiselect(
+        "选择要对比的直流",
+        options=list(DC_CONFIG.keys()),
+        default=list(DC_CONFIG.keys()),
+        key="compare_dcs"
+    )
+    
+    # 选择河流
+    compare_rivers = st.multiselect(
+        "选择河流（可多选）",
+        options=all_rivers,
+        default=all_rivers[:10] if len(all_rivers) >= 10 else all_rivers,
+        key="compare_rivers"
+    )
+    
+    if len(compare_dcs) > 0 and len(compare_rivers) > 0:
+        # 加载所有选中直流的数据
+        with st.spinner("正在加载各直流数据..."):
+            all_power_data = load_power_data_parallel(compare_dcs)
+        
+        # 各直流发电量与选中河流水位和只做一次连接（全部直流加载失败时为空表）
+        df_dc_joined = join_dc_water(df_water, all_power_data, compare_rivers, start_date, end_date)
+        dc_names = list(all_power_data)
+        
+        # 各直流相关系数一次算出（每列与水位按行成对剔除缺失值）
+        df_dc_power = df_dc_joined[dc_names]
+        pearson_r = df_dc_power.corrwith(df_dc_joined['water_level'])
+        n = df_dc_power.notna().sum()
+        keep = (n >= 10) & pearson_r.notna()
+        
+        if keep.any():
+            # 显示对比表格
+            df_comparison = pd.DataFrame({
+                '直流名称': pearson_r.index[keep],
+                'Pearson_r': pearson_r[keep].to_numpy(),
+                'R²': (pearson_r[keep] ** 2).to_numpy(),
+                'P值': _correlation_pvalue(pearson_r[keep].to_numpy(), n[keep].to_numpy()),
+                '样本量': n[keep].to_numpy()
+            })
+            df_comparison = df_comparison.sort_values('Pearson_r', key=abs, ascending=False)
+            
+            st.subheader("各直流相关性对比")
+            st.dataframe(
+                df_comparison.style.format({
+                    'Pearson_r': '{:.4f}',
+                    'R²': '{:.4f}',
+                    'P值': '{:.2e}'
+                }),
+                use_container_width=True
+            )
+            
+            # 绘制对比柱状图
+            fig_bar = go.Figure()
+            colors = [DC_CONFIG[dc]['color'] for dc in df_comparison['直流名称']]
+            
+            fig_bar.add_trace(go.Bar(
+                x=df_comparison['直流名称'],
+                y=df_comparison['Pearson_r'],
+                marker_color=colors,
+                text=df_comparison['Pearson_r'].apply(lambda x: f'{x:.4f}'),
+                textposition='outside'
+            ))
+            
+            fig_bar.update_layout(
+                title='各直流与河流水位Pearson相关系数对比',
+                xaxis_title='直流名称',
+                yaxis_title='Pearson相关系数',
+                height=400
+            )
+            
+            st.plotly_chart(fig_bar, use_container_width=True)
+            
+            # 绘制散点对比图
+            st.subheader("各直流散点分布对比")
+            fig_scatter = go.Figure()
+            
+            # 各直流散点合并为一条WebGL轨迹：按直流编码映射到分段离散色阶，颜色条标注直流名称
+            df_scatter = df_dc_joined.melt(
+                id_vars='water_level',
+                value_vars=dc_names,
+                var_name='dc_name',
+                value_name='power_sum'
+            ).dropna()
+            dc_codes = pd.Categorical(df_scatter['dc_name'], categories=dc_names).codes
+            
+            n_dc = len(dc_names)
+            colorscale = []
+            for i, dc_name in enumerate(dc_names):
+                colorscale.append([i / n_dc, DC_CONFIG[dc_name]['color']])
+                colorscale.append([(i + 1) / n_dc, DC_CONFIG[dc_name]['color']])
+            
+            fig_scatter.add_trace(
+                go.Scattergl(
+                    x=df_scatter['water_level'],
+                    y=df_scatter['power_sum'],
+                    mode='markers',
+                    name='各直流',
+                    hovertext=df_scatter['dc_name'],
+                    marker=dict(
+                        color=dc_codes,
+                        colorscale=colorscale,
+                        cmin=-0.5,
+                        cmax=n_dc - 0.5,
+                        colorbar=dict(title='直流', tickvals=list(range(n_dc)), ticktext=dc_names),
+                        size=5,
+                        opacity=0.5
+                    )
+                )
+            )
+            
+            fig_scatter.update_layout(
+                title=f'各直流与选定{len(compare_rivers)}条河流水位散点分布',
+                xaxis_title='河流水位总和(m)',
+                yaxis_title='日发电量(MWh)',
+                height=500
+            )
+            
+            st.plotly_chart(fig_scatter, use_container_width=True)
+        else:
+            st.warning("没有足够的数据进行对比分析")
+    else:
+        st.info("请选择至少一个直流和一条河流")
+
 # ============================================================================
 # 主应用
 # ============================================================================
@@ -476,13 +1163,16 @@ def main():
     df_water = process_water_data(df_river, str(start_date), str(end_date))
     
     # 筛选发电数据时间范围
-    df_power_filtered = df_power[
-        (df_power['date'] >= str(start_date)) & 
-        (df_power['date'] <= str(end_date))
-    ].copy()
+    df_power_filtered = filter_power(df_power, start_date, end_date)
+    
+    # 水位与当前直流发电量只合并一次，供各河流相关性排名使用
+    df_joined = join_water_power(df_water, df_power_filtered)
+    
+    # 逐日水位汇总只随水位数据变化，多河流组合和所有河流汇总共用
+    daily_aggs = build_daily_aggregates(df_water)
     
     # 获取所有河流列表
-    all_rivers = sorted(df_water['river_name'].unique().tolist())
+    all_rivers = river_list(df_water)
     
     # 侧边栏显示数据概览
     st.sidebar.markdown("---")
@@ -503,406 +1193,23 @@ def main():
     
     # ========== Tab 1: 单条河流分析 ==========
     with tab1:
-        st.header(f"单条河流与{selected_dc}发电量相关性分析")
-        
-        # 河流选择
-        selected_river = st.selectbox(
-            "选择河流",
-            options=all_rivers,
-            index=0 if len(all_rivers) > 0 else None,
-            key="tab1_river"
-        )
-        
-        if selected_river:
-            # 获取该河流数据
-            df_river_single = df_water[df_water['river_name'] == selected_river].copy()
-            df_river_daily = df_river_single.groupby('date').agg({
-                'water_level': 'mean'
-            }).reset_index()
-            
-            # 合并数据
-            df_merged = pd.merge(
-                df_power_filtered[['date', 'power_sum']], 
-                df_river_daily, 
-                on='date', 
-                how='inner'
-            )
-            df_merged = df_merged.dropna()
-            
-            # 计算相关性
-            if len(df_merged) >= 10:
-                stats = calculate_correlation(
-                    df_merged['water_level'].values,
-                    df_merged['power_sum'].values
-                )
-                
-                # 显示统计指标
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    st.metric("Pearson相关系数", f"{stats['pearson_r']:.4f}")
-                with col2:
-                    st.metric("R²决定系数", f"{stats['r2']:.4f}")
-                with col3:
-                    st.metric("样本量", f"{stats['n']}")
-                with col4:
-                    p_str = f"{stats['pearson_p']:.2e}" if stats['pearson_p'] < 0.001 else f"{stats['pearson_p']:.4f}"
-                    st.metric("P值", p_str)
-                
-                # 绘制图表
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.plotly_chart(plot_timeseries(df_merged, selected_river, selected_dc, stats), use_container_width=True)
-                with col2:
-                    st.plotly_chart(plot_scatter(df_merged, selected_river, selected_dc, stats), use_container_width=True)
-                
-                # 显示数据表格
-                with st.expander("查看原始数据"):
-                    st.dataframe(df_merged, use_container_width=True)
-            else:
-                st.warning(f"⚠️ 该河流有效数据点不足10个（当前: {len(df_merged)}），无法进行相关性分析")
+        render_single_river_tab(df_river, df_power, all_rivers, selected_dc, start_date, end_date)
     
     # ========== Tab 2: 多河流组合分析 ==========
     with tab2:
-        st.header(f"多河流组合与{selected_dc}发电量相关性分析")
-        st.info("💡 选择多条河流，系统将计算它们水位总和与发电量的相关性")
-        
-        # 多选河流
-        selected_rivers = st.multiselect(
-            "选择河流（可多选）",
-            options=all_rivers,
-            default=all_rivers[:5] if len(all_rivers) >= 5 else all_rivers,
-            key="tab2_rivers"
-        )
-        
-        # 预设河流组
-        st.markdown("**快捷选择：**")
-        preset_col1, preset_col2, preset_col3 = st.columns(3)
-        
-        # 预设河流组定义 - 【修改点2】可以在这里添加更多预设河流组
-        lancang_rivers = ['硕多岗河', '漾弓江', '龙川江', '白水河', '万马河']
-        nanpan_rivers = ['南盘江', '牛栏江', '大汶溪', '关河', '螳螂川', '宁蒗河', '落漏河', '马过河', '五郎河']
-        
-        with preset_col1:
-            if st.button("澜沧江水系", key="btn_lancang"):
-                st.session_state['selected_rivers_tab2'] = [r for r in lancang_rivers if r in all_rivers]
-                st.rerun()
-        
-        with preset_col2:
-            if st.button("南盘江水系", key="btn_nanpan"):
-                st.session_state['selected_rivers_tab2'] = [r for r in nanpan_rivers if r in all_rivers]
-                st.rerun()
-        
-        with preset_col3:
-            if st.button("全部河流", key="btn_all"):
-                st.session_state['selected_rivers_tab2'] = all_rivers
-                st.rerun()
-        
-        if len(selected_rivers) > 0:
-            # 筛选选中河流的数据
-            df_water_selected = df_water[df_water['river_name'].isin(selected_rivers)].copy()
-            
-            # 按日期求和
-            df_water_sum = df_water_selected.groupby('date').agg({
-                'water_level': 'sum'
-            }).reset_index()
-            
-            # 合并数据
-            df_merged = pd.merge(
-                df_power_filtered[['date', 'power_sum']], 
-                df_water_sum, 
-                on='date', 
-                how='inner'
-            )
-            df_merged = df_merged.dropna()
-            
-            if len(df_merged) >= 10:
-                stats = calculate_correlation(
-                    df_merged['water_level'].values,
-                    df_merged['power_sum'].values
-                )
-                
-                # 显示统计指标
-                st.markdown(f"**已选择 {len(selected_rivers)} 条河流：** {', '.join(selected_rivers)}")
-                
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    st.metric("Pearson相关系数", f"{stats['pearson_r']:.4f}")
-                with col2:
-                    st.metric("R²决定系数", f"{stats['r2']:.4f}")
-                with col3:
-                    st.metric("样本量", f"{stats['n']}")
-                with col4:
-                    p_str = f"{stats['pearson_p']:.2e}" if stats['pearson_p'] < 0.001 else f"{stats['pearson_p']:.4f}"
-                    st.metric("P值", p_str)
-                
-                # 绘制图表
-                river_name = f"选中{len(selected_rivers)}条河流总和"
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.plotly_chart(plot_timeseries(df_merged, river_name, selected_dc, stats), use_container_width=True)
-                with col2:
-                    st.plotly_chart(plot_scatter(df_merged, river_name, selected_dc, stats), use_container_width=True)
-            else:
-                st.warning(f"⚠️ 有效数据点不足10个（当前: {len(df_merged)}）")
-        else:
-            st.info("请选择至少一条河流")
+        render_multi_river_tab(daily_aggs, df_power_filtered, all_rivers, selected_dc)
     
     # ========== Tab 3: 所有河流汇总 ==========
     with tab3:
-        st.header(f"所有河流水位总和与{selected_dc}发电量相关性")
-        
-        # 按日期汇总所有河流水位
-        df_water_all = df_water.groupby('date').agg({
-            'water_level': 'sum'
-        }).reset_index()
-        
-        # 合并数据
-        df_merged_all = pd.merge(
-            df_power_filtered[['date', 'power_sum']], 
-            df_water_all, 
-            on='date', 
-            how='inner'
-        )
-        df_merged_all = df_merged_all.dropna()
-        
-        if len(df_merged_all) >= 10:
-            stats = calculate_correlation(
-                df_merged_all['water_level'].values,
-                df_merged_all['power_sum'].values
-            )
-            
-            # 显示统计指标
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("Pearson相关系数", f"{stats['pearson_r']:.4f}")
-            with col2:
-                st.metric("R²决定系数", f"{stats['r2']:.4f}")
-            with col3:
-                st.metric("河流总数", f"{len(all_rivers)} 条")
-            with col4:
-                st.metric("样本量", f"{stats['n']}")
-            
-            # 绘制图表
-            river_name = f"云南省所有河流（共{len(all_rivers)}条）"
-            col1, col2 = st.columns(2)
-            with col1:
-                st.plotly_chart(plot_timeseries(df_merged_all, river_name, selected_dc, stats), use_container_width=True)
-            with col2:
-                st.plotly_chart(plot_scatter(df_merged_all, river_name, selected_dc, stats), use_container_width=True)
+        render_all_rivers_tab(daily_aggs, df_power_filtered, all_rivers, selected_dc)
     
     # ========== Tab 4: 数据总览 ==========
     with tab4:
-        st.header(f"河流与{selected_dc}相关性排名")
-        
-        # 计算所有河流的相关性
-        correlation_results = []
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        for idx, river in enumerate(all_rivers):
-            status_text.text(f"正在计算: {river} ({idx+1}/{len(all_rivers)})")
-            progress_bar.progress((idx + 1) / len(all_rivers))
-            
-            df_river_single = df_water[df_water['river_name'] == river].copy()
-            df_river_daily = df_river_single.groupby('date').agg({
-                'water_level': 'mean'
-            }).reset_index()
-            
-            df_merged = pd.merge(
-                df_power_filtered[['date', 'power_sum']], 
-                df_river_daily, 
-                on='date', 
-                how='inner'
-            )
-            df_merged = df_merged.dropna()
-            
-            if len(df_merged) >= 10:
-                stats = calculate_correlation(
-                    df_merged['water_level'].values,
-                    df_merged['power_sum'].values
-                )
-                if stats:
-                    correlation_results.append({
-                        '河流名称': river,
-                        '样本量': stats['n'],
-                        'Pearson_r': stats['pearson_r'],
-                        'R²': stats['r2'],
-                        'P值': stats['pearson_p'],
-                        '回归斜率': stats['slope'],
-                        '数据起始': df_merged['date'].min().strftime('%Y-%m-%d'),
-                        '数据结束': df_merged['date'].max().strftime('%Y-%m-%d')
-                    })
-        
-        progress_bar.empty()
-        status_text.empty()
-        
-        if correlation_results:
-            df_results = pd.DataFrame(correlation_results)
-            df_results = df_results.sort_values('Pearson_r', key=abs, ascending=False).reset_index(drop=True)
-            df_results.insert(0, '排名', range(1, len(df_results) + 1))
-            
-            # 格式化显示（去掉background_gradient避免需要matplotlib）
-            st.dataframe(
-                df_results.style.format({
-                    'Pearson_r': '{:.4f}',
-                    'R²': '{:.4f}',
-                    'P值': '{:.2e}',
-                    '回归斜率': '{:.4f}'
-                }),
-                use_container_width=True,
-                height=600
-            )
-            
-            # 下载按钮
-            csv = df_results.to_csv(index=False, encoding='utf-8-sig')
-            st.download_button(
-                label=f"📥 下载{selected_dc}相关性分析结果 (CSV)",
-                data=csv,
-                file_name=f"river_correlation_{selected_dc}.csv",
-                mime="text/csv"
-            )
-        else:
-            st.warning("没有足够的数据进行相关性分析")
+        render_overview_tab(df_joined, selected_dc)
     
     # ========== Tab 5: 多直流对比 ==========
     with tab5:
-        st.header("多直流与河流水位相关性对比")
-        st.info("💡 对比不同直流与选定河流水位的相关性")
-        
-        # 选择要对比的直流
-        compare_dcs = st.multiselect(
-            "选择要对比的直流",
-            options=list(DC_CONFIG.keys()),
-            default=list(DC_CONFIG.keys()),
-            key="compare_dcs"
-        )
-        
-        # 选择河流
-        compare_rivers = st.multiselect(
-            "选择河流（可多选）",
-            options=all_rivers,
-            default=all_rivers[:10] if len(all_rivers) >= 10 else all_rivers,
-            key="compare_rivers"
-        )
-        
-        if len(compare_dcs) > 0 and len(compare_rivers) > 0:
-            # 加载所有选中直流的数据
-            with st.spinner("正在加载各直流数据..."):
-                all_power_data = {}
-                for dc_name in compare_dcs:
-                    df = load_power_data(dc_name)
-                    if df is not None:
-                        all_power_data[dc_name] = df
-            
-            # 处理选中河流的水位数据
-            df_water_selected = df_water[df_water['river_name'].isin(compare_rivers)].copy()
-            df_water_sum = df_water_selected.groupby('date').agg({'water_level': 'sum'}).reset_index()
-            
-            # 计算各直流的相关性
-            comparison_results = []
-            
-            for dc_name, df_power_dc in all_power_data.items():
-                # 筛选时间范围
-                df_power_filtered_dc = df_power_dc[
-                    (df_power_dc['date'] >= str(start_date)) & 
-                    (df_power_dc['date'] <= str(end_date))
-                ].copy()
-                
-                # 合并数据
-                df_merged = pd.merge(df_power_filtered_dc, df_water_sum, on='date', how='inner')
-                df_merged = df_merged.dropna()
-                
-                if len(df_merged) >= 10:
-                    stats = calculate_correlation(
-                        df_merged['water_level'].values,
-                        df_merged['power_sum'].values
-                    )
-                    if stats:
-                        comparison_results.append({
-                            '直流名称': dc_name,
-                            'Pearson_r': stats['pearson_r'],
-                            'R²': stats['r2'],
-                            'P值': stats['pearson_p'],
-                            '样本量': stats['n']
-                        })
-            
-            if comparison_results:
-                # 显示对比表格
-                df_comparison = pd.DataFrame(comparison_results)
-                df_comparison = df_comparison.sort_values('Pearson_r', key=abs, ascending=False)
-                
-                st.subheader("各直流相关性对比")
-                st.dataframe(
-                    df_comparison.style.format({
-                        'Pearson_r': '{:.4f}',
-                        'R²': '{:.4f}',
-                        'P值': '{:.2e}'
-                    }),
-                    use_container_width=True
-                )
-                
-                # 绘制对比柱状图
-                fig_bar = go.Figure()
-                colors = [DC_CONFIG[dc]['color'] for dc in df_comparison['直流名称']]
-                
-                fig_bar.add_trace(go.Bar(
-                    x=df_comparison['直流名称'],
-                    y=df_comparison['Pearson_r'],
-                    marker_color=colors,
-                    text=df_comparison['Pearson_r'].apply(lambda x: f'{x:.4f}'),
-                    textposition='outside'
-                ))
-                
-                fig_bar.update_layout(
-                    title='各直流与河流水位Pearson相关系数对比',
-                    xaxis_title='直流名称',
-                    yaxis_title='Pearson相关系数',
-                    height=400
-                )
-                
-                st.plotly_chart(fig_bar, use_container_width=True)
-                
-                # 绘制散点对比图
-                st.subheader("各直流散点分布对比")
-                fig_scatter = go.Figure()
-                
-                for dc_name, df_power_dc in all_power_data.items():
-                    df_power_filtered_dc = df_power_dc[
-                        (df_power_dc['date'] >= str(start_date)) & 
-                        (df_power_dc['date'] <= str(end_date))
-                    ].copy()
-                    
-                    df_merged = pd.merge(df_power_filtered_dc, df_water_sum, on='date', how='inner')
-                    df_merged = df_merged.dropna()
-                    
-                    if len(df_merged) > 0:
-                        fig_scatter.add_trace(
-                            go.Scatter(
-                                x=df_merged['water_level'],
-                                y=df_merged['power_sum'],
-                                mode='markers',
-                                name=dc_name,
-                                marker=dict(
-                                    color=DC_CONFIG[dc_name]['color'],
-                                    size=5,
-                                    opacity=0.5
-                                )
-                            )
-                        )
-                
-                fig_scatter.update_layout(
-                    title=f'各直流与选定{len(compare_rivers)}条河流水位散点分布',
-                    xaxis_title='河流水位总和(m)',
-                    yaxis_title='日发电量(MWh)',
-                    height=500
-                )
-                
-                st.plotly_chart(fig_scatter, use_container_width=True)
-            else:
-                st.warning("没有足够的数据进行对比分析")
-        else:
-            st.info("请选择至少一个直流和一条河流")
+        render_multi_dc_tab(df_water, all_rivers, start_date, end_date)
 
 # ============================================================================
 # 运行应用